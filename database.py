@@ -1,23 +1,144 @@
 import sqlite3
-from datetime import datetime
+import threading
+from contextlib import contextmanager
+import time
 
 DB_NAME = "data.db"
 
+# Tuned for a read-heavy dashboard: WAL lets readers run alongside the writer,
+# NORMAL sync is crash-safe under WAL, and a 64MB page cache stays warm.
+PRAGMAS = (
+    "PRAGMA journal_mode=WAL",
+    "PRAGMA synchronous=NORMAL",
+    "PRAGMA temp_store=MEMORY",
+    "PRAGMA cache_size=-64000",
+    "PRAGMA cache_spill=OFF",
+)
+
+# Hot-path statements are kept as module constants so every call hands sqlite3 the
+# identical string and hits the connection's prepared-statement cache instead of re-parsing.
+SQL_GET_ZONE_FEATURED = "SELECT featured FROM zones WHERE id = ?"
+SQL_COUNT_FEATURED = "SELECT COUNT(*) FROM zones WHERE featured = 1"
+SQL_TOGGLE_FEATURED = "UPDATE zones SET featured = 1 - featured WHERE id = ?"
+SQL_INSERT_ZONE = "INSERT INTO zones (name, lat, lon, featured) VALUES (?, ?, ?, ?)"
+SQL_INSERT_ALERT = "INSERT INTO alerts VALUES (NULL, ?, ?, ?, ?, ?, ?, ?, ?, ?)"
+SQL_GET_ZONES = "SELECT * FROM zones"
+SQL_GET_FEATURED_ZONES = "SELECT * FROM zones WHERE featured = 1 ORDER BY id LIMIT ?"
+SQL_GET_RECENT_ALERTS = "SELECT * FROM alerts ORDER BY id DESC LIMIT ?"
+SQL_DELETE_ZONE = "DELETE FROM zones WHERE id = ?"
+SQL_INSERT_CHAT = "INSERT INTO chat_history (session_id, role, content, timestamp) VALUES (?, ?, ?, ?)"
+SQL_GET_CHAT_HISTORY = "SELECT role, content FROM chat_history WHERE session_id = ? ORDER BY timestamp ASC, id ASC LIMIT ?"
+SQL_GET_ALERT = "SELECT * FROM alerts WHERE id = ?"
+SQL_DATA_VERSION = "PRAGMA data_version"
+SQL_GET_RECENT_ALERTS_WITH_BREACHED = (
+    "WITH recent AS (SELECT * FROM alerts ORDER BY id DESC LIMIT ?) "
+    "SELECT *, (SELECT COUNT(DISTINCT zone_name) FROM recent) AS breached_zones "
+    "FROM recent ORDER BY id DESC LIMIT ?"
+)
+
+# One long-lived connection shared by every helper (FastAPI runs sync work in a threadpool)
+_CONN = None
+_LOCK = threading.RLock()
+
+# Zones only change through add/remove/pin, so the full list is cached until one of those runs
+_zones_cache = None
+# Number of pinned zones, counted once and then kept in step by add/remove/pin
+_featured_count = None
+# Last seen PRAGMA data_version; it moves when another process (e.g. a second worker) commits
+_data_version = None
+
+def _open_connection():
+    """Opens the shared autocommit connection and applies the PRAGMAs once"""
+    conn = sqlite3.connect(DB_NAME, check_same_thread=False, isolation_level=None,
+                           cached_statements=128)
+    conn.row_factory = sqlite3.Row
+    for pragma in PRAGMAS:
+        conn.execute(pragma)
+    return conn
+
+@contextmanager
+def get_conn():
+    """Yields the shared connection, serialising access across threads"""
+    global _CONN
+    with _LOCK:
+        if _CONN is None:
+            _CONN = _open_connection()
+        yield _CONN
+
+@contextmanager
+def transaction():
+    """Groups several writes into one BEGIN...COMMIT (one WAL sync instead of one per statement)"""
+    with get_conn() as conn:
+        conn.execute("BEGIN")
+        try:
+            yield conn
+        except Exception:
+            conn.execute("ROLLBACK")
+            raise
+        conn.execute("COMMIT")
+
+def _invalidate_zones():
+    global _zones_cache
+    _zones_cache = None
+
+def _drop_stale_caches(conn):
+    """Clears the in-memory caches if another connection has written since we last looked"""
+    global _data_version, _featured_count
+    version = conn.execute(SQL_DATA_VERSION).fetchone()[0]
+    if version != _data_version:
+        _data_version = version
+        _featured_count = None
+        _invalidate_zones()
+
+def _get_featured_count(conn):
+    """Returns the pinned-zone count, querying only on first use or after a reset"""
+    global _featured_count
+    _drop_stale_caches(conn)
+    if _featured_count is None:
+        _featured_count = conn.execute(SQL_COUNT_FEATURED).fetchone()[0]
+    return _featured_count
+
+# Timestamps are stored as unix epoch INTEGERs and only formatted for display
+CREATE_ALERTS = '''CREATE TABLE IF NOT EXISTS alerts 
+                 (id INTEGER PRIMARY KEY AUTOINCREMENT, timestamp INTEGER, zone_name TEXT, 
+                  temp REAL, humidity REAL, wind REAL, aqi INTEGER, uv REAL, noise REAL, reason TEXT)'''
+CREATE_CHAT_HISTORY = '''CREATE TABLE IF NOT EXISTS chat_history 
+                 (id INTEGER PRIMARY KEY AUTOINCREMENT, session_id TEXT, role TEXT, content TEXT, timestamp INTEGER)'''
+
+def _migrate_epoch_timestamps(conn, table, create_sql):
+    """Rebuilds a table created with text timestamps, converting its local-time strings to epoch seconds"""
+    types = {c["name"]: c["type"] for c in conn.execute(f"PRAGMA table_info({table})").fetchall()}
+    if types.get("timestamp", "INTEGER") == "INTEGER":
+        return
+    columns = list(types)
+    select = ", ".join(
+        "CAST(strftime('%s', timestamp, 'utc') AS INTEGER)" if c == "timestamp" else c for c in columns
+    )
+    with transaction():
+        conn.execute(f"ALTER TABLE {table} RENAME TO {table}_old")
+        conn.execute(create_sql)
+        conn.execute(f"INSERT INTO {table} ({', '.join(columns)}) SELECT {select} FROM {table}_old")
+        conn.execute(f"DROP TABLE {table}_old")
+    print(f"🔁 Migrated {table}.timestamp to epoch INTEGER.")
+
 def init_db():
     """Creates tables if they don't exist"""
-    conn = sqlite3.connect(DB_NAME)
-    c = conn.cursor()
-    c.execute('''CREATE TABLE IF NOT EXISTS zones 
-                 (id INTEGER PRIMARY KEY, name TEXT, lat REAL, lon REAL, featured INTEGER DEFAULT 0)''')
-    c.execute('''CREATE TABLE IF NOT EXISTS alerts 
-                 (id INTEGER PRIMARY KEY AUTOINCREMENT, timestamp TEXT, zone_name TEXT, 
-                  temp REAL, humidity REAL, wind REAL, aqi INTEGER, uv REAL, noise REAL, reason TEXT)''')
-    
-    # New table for chat memory persistence
-    c.execute('''CREATE TABLE IF NOT EXISTS chat_history 
-                 (id INTEGER PRIMARY KEY AUTOINCREMENT, session_id TEXT, role TEXT, content TEXT, timestamp DATETIME)''')
-    conn.commit()
-    conn.close()
+    with get_conn() as conn:
+        conn.execute('''CREATE TABLE IF NOT EXISTS zones 
+                     (id INTEGER PRIMARY KEY, name TEXT, lat REAL, lon REAL, featured INTEGER DEFAULT 0)''')
+        conn.execute(CREATE_ALERTS)
+        
+        # New table for chat memory persistence
+        conn.execute(CREATE_CHAT_HISTORY)
+
+        # Databases from before the epoch switch still hold TEXT/DATETIME timestamps
+        _migrate_epoch_timestamps(conn, "alerts", CREATE_ALERTS)
+        _migrate_epoch_timestamps(conn, "chat_history", CREATE_CHAT_HISTORY)
+
+        # Indexes for the per-session chat lookup and per-zone alert queries
+        conn.execute("CREATE INDEX IF NOT EXISTS idx_chat_session_ts ON chat_history(session_id, timestamp)")
+        conn.execute("CREATE INDEX IF NOT EXISTS idx_alerts_zone ON alerts(zone_name)")
+        conn.execute("CREATE INDEX IF NOT EXISTS idx_zones_featured ON zones(featured) WHERE featured = 1")
 
 def seed_zones():
     """Populates the database with initial Indian city data if empty"""
@@ -41,96 +162,105 @@ def seed_zones():
 
 def toggle_zone_featured(zone_id):
     """Pins or unpins a zone for the dashboard view"""
-    conn = sqlite3.connect(DB_NAME)
-    current = conn.execute("SELECT featured FROM zones WHERE id = ?", (zone_id,)).fetchone()[0]
-    
-    if current == 0: 
-        count = conn.execute("SELECT COUNT(*) FROM zones WHERE featured = 1").fetchone()[0]
-        if count >= 5:
-            conn.close()
-            return False 
-            
-    conn.execute("UPDATE zones SET featured = 1 - featured WHERE id = ?", (zone_id,))
-    conn.commit()
-    conn.close()
+    global _featured_count
+    with get_conn() as conn:
+        count = _get_featured_count(conn)
+        current = conn.execute(SQL_GET_ZONE_FEATURED, (zone_id,)).fetchone()[0]
+        
+        if current == 0: 
+            if count >= 5:
+                return False 
+                
+        conn.execute(SQL_TOGGLE_FEATURED, (zone_id,))
+        _featured_count = count + 1 if current == 0 else count - 1
+        _invalidate_zones()
     return True
 
 def add_zone(name, lat, lon):
     """Inserts a new zone and auto-pins if under the limit"""
-    conn = sqlite3.connect(DB_NAME)
-    count = conn.execute("SELECT COUNT(*) FROM zones WHERE featured = 1").fetchone()[0]
-    is_featured = 1 if count < 5 else 0
-    conn.execute("INSERT INTO zones (name, lat, lon, featured) VALUES (?, ?, ?, ?)", (name, lat, lon, is_featured))
-    conn.commit()
-    conn.close()
-
-def log_alert(zone_name, m, reason):
-    """Saves a threshold breach incident to the history table"""
-    conn = sqlite3.connect(DB_NAME)
-    timestamp = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
-    conn.execute("INSERT INTO alerts VALUES (NULL, ?, ?, ?, ?, ?, ?, ?, ?, ?)",
-              (timestamp, zone_name, m['temp'], m['humidity'], m['wind_speed'], m['aqi'], m['uv'], m['noise'], reason))
-    conn.commit()
-    conn.close()
+    global _featured_count
+    with get_conn() as conn:
+        count = _get_featured_count(conn)
+        is_featured = 1 if count < 5 else 0
+        conn.execute(SQL_INSERT_ZONE, (name, lat, lon, is_featured))
+        _featured_count = count + is_featured
+        _invalidate_zones()
+
+def log_alerts_bulk(entries):
+    """Saves a batch of (zone_name, metrics, reason) breaches in a single transaction"""
+    if not entries:
+        return
+    timestamp = int(time.time())
+    rows = [(timestamp, zone_name, m['temp'], m['humidity'], m['wind_speed'], m['aqi'], m['uv'], m['noise'], reason)
+            for zone_name, m, reason in entries]
+    with transaction() as conn:
+        conn.executemany(SQL_INSERT_ALERT, rows)
 
 def get_zones():
-    """Retrieves all registered zones"""
-    conn = sqlite3.connect(DB_NAME)
-    conn.row_factory = sqlite3.Row
-    zones = conn.execute("SELECT * FROM zones").fetchall()
-    conn.close()
-    return [dict(z) for z in zones]
+    """Retrieves all registered zones (served from memory until a zone is added, removed or pinned)"""
+    global _zones_cache
+    with get_conn() as conn:
+        _drop_stale_caches(conn)
+        if _zones_cache is None:
+            # Kept as dicts: the dashboard hands this list to the template's tojson filter
+            _zones_cache = [dict(z) for z in conn.execute(SQL_GET_ZONES).fetchall()]
+        return _zones_cache
+
+def get_featured_zones(limit=5):
+    """Retrieves the pinned zones shown on the dashboard"""
+    with get_conn() as conn:
+        return conn.execute(SQL_GET_FEATURED_ZONES, (limit,)).fetchall()
 
 def get_recent_alerts(n):
     """Retrieves the last N alerts for the logs table"""
-    conn = sqlite3.connect(DB_NAME)
-    conn.row_factory = sqlite3.Row
-    res = conn.execute("SELECT * FROM alerts ORDER BY id DESC LIMIT ?", (n,)).fetchall()
-    conn.close()
-    return [dict(r) for r in res]
+    with get_conn() as conn:
+        return conn.execute(SQL_GET_RECENT_ALERTS, (n,)).fetchall()
+
+def get_recent_alerts_with_breached_count(n, window=100):
+    """Retrieves the last N alerts plus the distinct zone count over the last `window` alerts, in one query"""
+    with get_conn() as conn:
+        res = conn.execute(SQL_GET_RECENT_ALERTS_WITH_BREACHED, (window, n)).fetchall()
+    breached_zones = res[0]["breached_zones"] if res else 0
+    return res, breached_zones
 
 def remove_zone(zone_id):
     """Deletes a zone by its ID"""
-    conn = sqlite3.connect(DB_NAME)
-    conn.execute("DELETE FROM zones WHERE id = ?", (zone_id,))
-    conn.commit()
-    conn.close()
+    global _featured_count
+    with get_conn() as conn:
+        count = _get_featured_count(conn)
+        row = conn.execute(SQL_GET_ZONE_FEATURED, (zone_id,)).fetchone()
+        conn.execute(SQL_DELETE_ZONE, (zone_id,))
+        if row and row[0] == 1:
+            _featured_count = count - 1
+        _invalidate_zones()
 
 # Helper to save and load history
 def save_chat_message(session_id, role, content):
-    conn = sqlite3.connect(DB_NAME)
-    conn.execute("INSERT INTO chat_history (session_id, role, content, timestamp) VALUES (?, ?, ?, ?)",
-                 (session_id, role, content, datetime.now()))
-    conn.commit()
-    conn.close()
+    with get_conn() as conn:
+        conn.execute(SQL_INSERT_CHAT,
+                     (session_id, role, content, int(time.time())))
 
 def get_chat_history(session_id, limit=10):
-    conn = sqlite3.connect(DB_NAME)
-    conn.row_factory = sqlite3.Row
-    res = conn.execute("SELECT role, content FROM chat_history WHERE session_id = ? ORDER BY timestamp ASC LIMIT ?", 
-                       (session_id, limit)).fetchall()
-    conn.close()
+    with get_conn() as conn:
+        res = conn.execute(SQL_GET_CHAT_HISTORY, 
+                           (session_id, limit)).fetchall()
     return [{"role": r["role"], "content": r["content"]} for r in res]
 
 def get_alert_by_id(alert_id):
-    conn = sqlite3.connect(DB_NAME)
-    conn.row_factory = sqlite3.Row
-    # Use the primary key 'id' we added earlier
-    res = conn.execute("SELECT * FROM alerts WHERE id = ?", (alert_id,)).fetchone()
-    conn.close()
-    return dict(res) if res else None
+    with get_conn() as conn:
+        # Use the primary key 'id' we added earlier
+        return conn.execute(SQL_GET_ALERT, (alert_id,)).fetchone()
 
 def reset_and_reseed():
     """Wipes the entire database and restarts from scratch."""
-    conn = sqlite3.connect(DB_NAME)
-    c = conn.cursor()
-    
-    # 1. Drop all tables
-    c.execute("DROP TABLE IF EXISTS zones")
-    c.execute("DROP TABLE IF EXISTS alerts")
-    c.execute("DROP TABLE IF EXISTS chat_history")
-    conn.commit()
-    conn.close()
+    global _featured_count
+    with get_conn() as conn:
+        # 1. Drop all tables
+        conn.execute("DROP TABLE IF EXISTS zones")
+        conn.execute("DROP TABLE IF EXISTS alerts")
+        conn.execute("DROP TABLE IF EXISTS chat_history")
+        _featured_count = None
+        _invalidate_zones()
     
     # 2. Re-initialize and Re-seed
     init_db()
@@ -1,16 +1,20 @@
-import requests
+import httpx
+import orjson
 from fastapi import FastAPI, Request, Form
-from fastapi.responses import HTMLResponse, RedirectResponse
-from fastapi.templating import Jinja2Templates
+from fastapi.responses import HTMLResponse, ORJSONResponse, RedirectResponse, StreamingResponse
+from jinja2 import Environment, FileSystemLoader
 from contextlib import asynccontextmanager
 import os
+import sys
+import time
+from datetime import datetime
 from dotenv import load_dotenv
-from openai import OpenAI
+from openai import AsyncOpenAI
 
 # Internal Imports - Now importing directly from the root
 import database as db
 from database import seed_zones
-from model import generate_synthetic_data, evaluate_alerts
+from model import generate_synthetic_data_batch, evaluate_alerts_batch, batch_to_records
 
 @asynccontextmanager
 async def lifespan(app: FastAPI):
@@ -19,13 +23,43 @@ async def lifespan(app: FastAPI):
     db.init_db() 
     # SECOND: Seed the data (Pins your zones automatically)
     seed_zones()
+    # THIRD: One pooled async HTTP client for the LLM, so chat calls never block the event loop
+    app.state.http = httpx.AsyncClient(timeout=httpx.Timeout(60.0, connect=10.0))
+    app.state.llm = AsyncOpenAI(
+        base_url="https://router.huggingface.co/v1",
+        api_key=os.getenv("HF_API_KEY"),
+        http_client=app.state.http
+    )
     yield
+    await app.state.http.aclose()
     print("🛑 Shutting down EcoWatcher Engine...")
 
-app = FastAPI(lifespan=lifespan)
+# orjson serializes the float-heavy telemetry payloads in C
+app = FastAPI(lifespan=lifespan, default_response_class=ORJSONResponse)
 
 # --- FIX 1: Look for index.html in the root directory instead of /templates ---
-templates = Jinja2Templates(directory=".")
+# Compiled once at startup; auto_reload=False skips the per-render mtime check
+templates = Environment(loader=FileSystemLoader("."), autoescape=True, auto_reload=False, cache_size=400)
+
+def format_timestamp(ts):
+    """Renders a stored epoch timestamp as local time for the UI and AI context"""
+    return datetime.fromtimestamp(ts).strftime("%Y-%m-%d %H:%M:%S") if ts is not None else ""
+
+templates.filters["datetime"] = format_timestamp
+DASHBOARD_TEMPLATE = templates.get_template("index.html")
+
+# --- Telemetry Sampling ---
+
+def sample_zones(zones):
+    """
+    Draws metrics for every zone in one NumPy batch, checks thresholds column-wise
+    and logs all breaches in a single transaction. Returns (metrics, reasons) aligned with zones.
+    """
+    batch = generate_synthetic_data_batch(len(zones))
+    reasons = evaluate_alerts_batch(batch)
+    metrics = batch_to_records(batch)
+    db.log_alerts_bulk([(zones[i]['name'], metrics[i], reason) for i, reason in enumerate(reasons) if reason])
+    return metrics, reasons
 
 # --- UI Routes ---
 
@@ -33,30 +67,21 @@ templates = Jinja2Templates(directory=".")
 async def dashboard(request: Request):
     """Main view: Shows featured zones and recent alert history"""
     all_zones = db.get_zones()
-    recent_alerts = db.get_recent_alerts(15)
+    featured_zones = db.get_featured_zones(5)
     
-    featured_zones = [z for z in all_zones if z.get('featured') == 1][:5]
-    
-    dashboard_data = []
-    for zone in featured_zones:
-        data = generate_synthetic_data()
-        reason = evaluate_alerts(data)
-        if reason:
-            db.log_alert(zone['name'], data, reason)
-        dashboard_data.append({"info": zone, "metrics": data})
-
-    alerts_from_db = db.get_recent_alerts(100)
-    problematic_zones = {a['zone_name'] for a in alerts_from_db}
+    metrics, _ = sample_zones(featured_zones)
+    dashboard_data = [{"info": zone, "metrics": data} for zone, data in zip(featured_zones, metrics)]
+
+    recent_alerts, breached_zones_count = db.get_recent_alerts_with_breached_count(15, window=100)
     
     # Renders index.html from the root
-    return templates.TemplateResponse("index.html", {
-        "request": request,
-        "zones": all_zones,
-        "dashboard_zones": dashboard_data,
-        "alerts": recent_alerts,
-        "total_zones": len(all_zones),
-        "breached_zones_count": len(problematic_zones)
-    })
+    return HTMLResponse(DASHBOARD_TEMPLATE.render(
+        zones=all_zones,
+        dashboard_zones=dashboard_data,
+        alerts=recent_alerts,
+        total_zones=len(all_zones),
+        breached_zones_count=breached_zones_count
+    ))
 
 # --- Management Routes ---
 
@@ -77,30 +102,78 @@ async def delete_zone(zone_id: int):
     db.remove_zone(zone_id)
     return RedirectResponse(url="/", status_code=303)
 
+# --- Live Snapshot Cache ---
+# Latest metrics per zone from /api/update, reused as AI context so the advisor
+# sees the same numbers as the UI (the dashboard polls every 15s).
+SNAPSHOT_TTL = 15.0
+_LATEST: dict[str, dict] = {}
+_latest_at = 0.0
+
+def _store_snapshot(snapshot):
+    global _latest_at
+    _LATEST.clear()
+    _LATEST.update(snapshot)
+    _latest_at = time.monotonic()
+
+def get_latest_snapshot():
+    """Returns a copy of the cached zone metrics, regenerating once if stale"""
+    if time.monotonic() - _latest_at > SNAPSHOT_TTL:
+        zones = db.get_zones()
+        batch = generate_synthetic_data_batch(len(zones))
+        _store_snapshot(zip((z['name'] for z in zones), batch_to_records(batch)))
+    return dict(_LATEST)
+
 # --- API & AI Routes ---
 
-@app.get("/api/update")
+@app.get("/api/update", response_class=ORJSONResponse)
 async def get_live_updates():
     zones = db.get_zones()
-    updates = []
-    for zone in zones:
-        data = generate_synthetic_data()
-        reason = evaluate_alerts(data)
-        if reason:
-            db.log_alert(zone['name'], data, reason)
-        updates.append({"zone": zone['name'], "metrics": data, "alert": reason})
-    return updates
+    metrics, reasons = sample_zones(zones)
+    updates = [{"zone": zone['name'], "metrics": data, "alert": reason}
+               for zone, data, reason in zip(zones, metrics, reasons)]
+    _store_snapshot((u["zone"], u["metrics"]) for u in updates)
+    return ORJSONResponse(updates)
 
 load_dotenv()
 
-# INITIALIZE CLIENT
-client = OpenAI(
-    base_url="https://router.huggingface.co/v1",
-    api_key=os.getenv("HF_API_KEY") 
+# --- Prompt Templates (built once at import, filled per request) ---
+SYSTEM_PROMPT_TEMPLATE = """
+You are EcoWatcher AI. Provide a technical environmental risk assessment.
+
+STRICT RULES:
+- Only use the provided metrics.
+- If Alert ID is mentioned, analyze ONLY that data.
+- Keep answers under 120 words.
+- Use simple Markdown for formatting (bolding, short tables).
+
+{priority_context}
+{context_data}
+{general_context}
+"""
+
+PRIORITY_CONTEXT_TEMPLATE = (
+    "STRICT FOCUS DATA for Alert ID {id}:\n"
+    "- Zone: {zone_name}\n"
+    "- Breach Reason: {reason}\n"
+    "- AQI: {aqi}, Temp: {temp}°C, UV: {uv}\n"
+    "- Recorded at: {recorded_at}\n\n"
+)
+
+SNAPSHOT_LINE_TEMPLATE = (
+    "{name} | AQI: {aqi}, Temp: {temp}°C, Humidity: {humidity}%, "
+    "Wind: {wind_speed} km/h, UV: {uv}, Noise: {noise} dB"
 )
 
+def sse_event(payload):
+    """Encodes one server-sent event carrying a JSON payload"""
+    return b"data: " + orjson.dumps(payload) + b"\n\n"
+
+def sse_error(e):
+    return StreamingResponse(iter([sse_event({"error": f"Error: {str(e)}"})]), media_type="text/event-stream")
+
 @app.post("/api/chat")
 async def eco_chat(request: Request):
+    """Streams the AI reply token-by-token as server-sent events, then saves the exchange"""
     try:
         body = await request.json()
         user_query = body.get("query")
@@ -111,12 +184,8 @@ async def eco_chat(request: Request):
         if selected_id:
             alert = db.get_alert_by_id(selected_id)
             if alert:
-                priority_context = (
-                    f"STRICT FOCUS DATA for Alert ID {alert['id']}:\n"
-                    f"- Zone: {alert['zone_name']}\n"
-                    f"- Breach Reason: {alert['reason']}\n"
-                    f"- AQI: {alert['aqi']}, Temp: {alert['temp']}°C, UV: {alert['uv']}\n"
-                    f"- Recorded at: {alert['timestamp']}\n\n"
+                priority_context = PRIORITY_CONTEXT_TEMPLATE.format(
+                    **alert, recorded_at=format_timestamp(alert['timestamp'])
                 )
 
         recent_alerts = db.get_recent_alerts(5)
@@ -124,40 +193,51 @@ async def eco_chat(request: Request):
             [f"ID: {a['id']} | {a['zone_name']} | {a['reason']}" for a in recent_alerts]
         )
 
+        context_data = "CURRENT SNAPSHOT:\n" + "\n".join(
+            [SNAPSHOT_LINE_TEMPLATE.format(name=name, **d) for name, d in get_latest_snapshot().items()]
+        )
+
         history = db.get_chat_history(session_id)
         
         messages = [{
             "role": "system",
-            "content": f"""
-        You are EcoWatcher AI. Provide a technical environmental risk assessment.
-
-        STRICT RULES:
-        - Only use the provided metrics.
-        - If Alert ID is mentioned, analyze ONLY that data.
-        - Keep answers under 120 words.
-        - Use simple Markdown for formatting (bolding, short tables).
-
-        {priority_context}
-        {general_context}
-        """
+            "content": SYSTEM_PROMPT_TEMPLATE.format(
+                priority_context=priority_context,
+                context_data=context_data,
+                general_context=general_context
+            )
         }]
         messages.extend(history)
         messages.append({"role": "user", "content": user_query})
 
-        response = client.chat.completions.create(
+        stream = await request.app.state.llm.chat.completions.create(
             model="Qwen/Qwen3-Coder-Next:novita", 
             messages=messages,
-            temperature=0.1 # Low temperature for factual accuracy
+            temperature=0.1, # Low temperature for factual accuracy
+            stream=True
         )
-        ai_reply = response.choices[0].message.content
-        
-        db.save_chat_message(session_id, "user", user_query)
-        db.save_chat_message(session_id, "assistant", ai_reply)
-        
-        return {"response": ai_reply}
 
     except Exception as e:
-        return {"response": f"Error: {str(e)}"}
+        return sse_error(e)
+
+    async def relay():
+        parts = []
+        try:
+            async for chunk in stream:
+                delta = chunk.choices[0].delta.content if chunk.choices else None
+                if delta:
+                    parts.append(delta)
+                    yield sse_event({"delta": delta})
+        except Exception as e:
+            yield sse_event({"error": f"Error: {str(e)}"})
+            return
+
+        # Persist only once the full reply has arrived
+        db.save_chat_message(session_id, "user", user_query)
+        db.save_chat_message(session_id, "assistant", "".join(parts))
+        yield sse_event({"done": True})
+
+    return StreamingResponse(relay(), media_type="text/event-stream")
     
 @app.get("/api/system/reset", response_class=RedirectResponse)
 async def system_reset():
@@ -168,7 +248,16 @@ async def system_reset():
     return RedirectResponse(url="/?msg=system_reset_complete", status_code=303)
     
 if __name__ == "__main__":
+    # Prepare the database once here so the workers don't race to seed it
     db.init_db()
+    seed_zones()
     import uvicorn
-    # Local fallback
-    uvicorn.run(app, host="127.0.0.1", port=8000)
\ No newline at end of file
+    # Local fallback: C event loop (uvloop has no Windows build) + C HTTP parser, one worker per core
+    uvicorn.run(
+        "main:app",
+        host="127.0.0.1",
+        port=8000,
+        loop="asyncio" if sys.platform == "win32" else "uvloop",
+        http="httptools",
+        workers=int(os.getenv("WEB_CONCURRENCY", os.cpu_count() or 1))
+    )
\ No newline at end of file
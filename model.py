@@ -1,4 +1,9 @@
-import random
+import numpy as np
+
+try:
+    from numba import njit
+except ImportError:  # numba is optional; the NumPy evaluator below is the fallback
+    njit = None
 
 # --- Threshold Configuration ---
 # Centralized limits used for both evaluation and AI prompts
@@ -10,19 +15,34 @@ THRESHOLDS = {
     "wind_speed": 20.0  # km/h
 }
 
+# --- Synthetic Telemetry Ranges ---
+# [low, high) bounds per column: temp, humidity, wind_speed, aqi, uv, noise
+_LOWS = np.array([0, 0, 1, 0, 0, 0])
+_HIGHS = np.array([41, 90, 21, 152, 9, 86])
+_RNG = np.random.default_rng()
+
+# Breach labels in the order they appear in an alert reason
+ALERT_LABELS = (
+    ("aqi", "High Pollution"),
+    ("temp", "Extreme Heat"),
+    ("uv", "High UV Radiation"),
+    ("noise", "Noise Violation"),
+    ("wind_speed", "High Wind Speed"),
+)
+
+# Bit i of a breach mask is set when ALERT_LABELS[i] fires; each of the 32 masks maps to its reason
+_LIMITS = np.array([THRESHOLDS[key] for key, _ in ALERT_LABELS], dtype=np.float64)
+_REASONS = [
+    ", ".join(label for bit, (_, label) in enumerate(ALERT_LABELS) if mask >> bit & 1) or None
+    for mask in range(1 << len(ALERT_LABELS))
+]
+
 def generate_synthetic_data():
     """
     Generates the 6 required environmental parameters using random distribution.
     Used by the dashboard and the AI context builder.
     """
-    return {
-        "temp": round(random.uniform(0, 41), 2),
-        "humidity": round(random.uniform(0, 90), 2),
-        "wind_speed": round(random.uniform(1, 21), 2),
-        "aqi": random.randint(0, 151),
-        "uv": round(random.uniform(0, 9), 1),
-        "noise": round(random.uniform(0, 86), 1)
-    }
+    return batch_to_records(generate_synthetic_data_batch(1))[0]
 
 def evaluate_alerts(data):
     """
@@ -42,4 +62,61 @@ def evaluate_alerts(data):
     if data["wind_speed"] > THRESHOLDS["wind_speed"]: 
         alerts.append("High Wind Speed")
     
-    return ", ".join(alerts) if alerts else None
\ No newline at end of file
+    return ", ".join(alerts) if alerts else None
+
+def generate_synthetic_data_batch(n):
+    """
+    Vectorized generate_synthetic_data: draws the 6 parameters for n zones in one call.
+    Returns a dict of NumPy columns, one value per zone.
+    """
+    vals = _RNG.uniform(_LOWS, _HIGHS, size=(n, 6))
+    return {
+        "temp": vals[:, 0].round(2),
+        "humidity": vals[:, 1].round(2),
+        "wind_speed": vals[:, 2].round(2),
+        "aqi": vals[:, 3].astype(np.int64),  # floor of [0, 152) matches randint(0, 151)
+        "uv": vals[:, 4].round(1),
+        "noise": vals[:, 5].round(1)
+    }
+
+def _breach_bits_numpy(aqi, temp, uv, noise, wind_speed, limits):
+    """Encodes every zone's breaches as a uint8 bitmask (bit order follows ALERT_LABELS)"""
+    bits = np.zeros(len(aqi), dtype=np.uint8)
+    for bit, col in enumerate((aqi, temp, uv, noise, wind_speed)):
+        bits |= (col > limits[bit]).astype(np.uint8) << bit
+    return bits
+
+def _breach_bits_kernel(aqi, temp, uv, noise, wind_speed, limits):
+    """Fused single-pass version of _breach_bits_numpy, compiled with numba when available"""
+    n = aqi.shape[0]
+    bits = np.zeros(n, dtype=np.uint8)
+    for i in range(n):
+        b = 0
+        if aqi[i] > limits[0]:
+            b |= 1
+        if temp[i] > limits[1]:
+            b |= 2
+        if uv[i] > limits[2]:
+            b |= 4
+        if noise[i] > limits[3]:
+            b |= 8
+        if wind_speed[i] > limits[4]:
+            b |= 16
+        bits[i] = b
+    return bits
+
+# cache=True persists the compiled kernel so restarts skip the JIT cost
+_breach_bits = njit(cache=True)(_breach_bits_kernel) if njit else _breach_bits_numpy
+
+def evaluate_alerts_batch(arrs):
+    """
+    Vectorized evaluate_alerts over the columns from generate_synthetic_data_batch.
+    Returns one reason string (or None if safe) per zone.
+    """
+    bits = _breach_bits(arrs["aqi"], arrs["temp"], arrs["uv"], arrs["noise"], arrs["wind_speed"], _LIMITS)
+    return [_REASONS[b] for b in bits.tolist()]
+
+def batch_to_records(arrs):
+    """Splits batch columns into per-zone dicts of plain Python numbers (JSON/SQLite friendly)"""
+    columns = {key: col.tolist() for key, col in arrs.items()}
+    return [dict(zip(columns, row)) for row in zip(*columns.values())]
\ No newline at end of file